@@ -3,13 +3,14 @@ import json
 import pandas as pd
 from datasets import load_dataset
 from tqdm import tqdm
-dataset = load_dataset("seungheondoh/socialfx-original")
+dataset = load_dataset("seungheondoh/socialfx-original", streaming=True)
 
 for key in dataset.keys():
     db = dataset[key]
+    # one file per item: the audealize run_*.sh scripts look up json/{key}/{id}.json
+    os.makedirs(f"./json/{key}", exist_ok=True)
     for item in tqdm(db):
         _id = item['id']
         results = {"text": item['text'], "param_values": item['param_values']}
-        os.makedirs(f"./json/{key}", exist_ok=True)
         with open(f"./json/{key}/{_id}.json", "w") as f:
             json.dump(results, f, indent=4)
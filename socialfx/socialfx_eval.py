@@ -1,6 +1,8 @@
 import ast
+import json
 import os
-from collections import Counter
+from collections import defaultdict
+from functools import lru_cache
 from datasets import load_dataset, Dataset, DatasetDict
 import pandas as pd
 import numpy as np
@@ -12,49 +14,49 @@ STOP_WORDS = ['drum','bass', 'nice', 'pleasant', 'good', 'none', 'unclear', "hap
 EQ_TRESHOLD = 20
 REVERB_TRESHOLD = 100
 
+@lru_cache(maxsize=None)
+def parse_lang(extra):
+    """Parse the language out of a raw `extra` string, defaulting to English"""
+    try:
+        try:
+            extra = json.loads(extra)
+        except ValueError:
+            # older uploads stored `extra` as a Python dict repr
+            extra = ast.literal_eval(extra)
+        return extra["lang"].lower()
+    except (ValueError, SyntaxError, KeyError, TypeError, AttributeError):
+        return "english"
+
 def tag_merge(df, fx_type):
     """Filter dataset to get English tags and their IDs"""
-    filtered = []
-    for idx, row in df.iterrows():
-        tags = row["text"].lower().split(",")
-        try:
-            extra = ast.literal_eval(row["extra"])
-            lang = extra["lang"].lower()
-        except:
-            lang = "english"
-        for tag in tags:
-            if fx_type == "eq":
-                tag = EQ_MAPPING.get(tag, tag)
-            elif fx_type == "reverb":
-                tag = REVERB_MAPPING.get(tag, tag)
-            if tag in STOP_WORDS:
-                continue
-            filtered.append({
-                "id": row["id"],
-                "tags": tag,
-                "lang": lang
-            })
-    df_filtered = pd.DataFrame(filtered)
+    df_filtered = df[["id"]].assign(
+        tags=df["text"].str.lower().str.split(","),
+        lang=df["extra"].map(parse_lang),
+    ).explode("tags", ignore_index=True)
+    if fx_type == "eq":
+        df_filtered["tags"] = df_filtered["tags"].map(EQ_MAPPING).fillna(df_filtered["tags"])
+    elif fx_type == "reverb":
+        df_filtered["tags"] = df_filtered["tags"].map(REVERB_MAPPING).fillna(df_filtered["tags"])
+    df_filtered = df_filtered[~df_filtered["tags"].isin(STOP_WORDS)]
     return df_filtered[df_filtered["lang"] == "english"]
 
 def eval_for_classification(tag2ids_dict):
     """Evaluate for classification"""
-    id2tags = {_id:[] for k,v in tag2ids_dict.items() for _id in v }
+    id2tags = {}
     for tag,ids in tag2ids_dict.items():
         for _id in ids:
-            id2tags[_id].append(tag)
+            id2tags.setdefault(_id, []).append(tag)
     unique_ids = list(id2tags.keys())
-    muiltilabel = [id2tags[i] for i in unique_ids]
+    muiltilabel = list(id2tags.values())
     mlb = MultiLabelBinarizer()
-    mlb.fit(muiltilabel)
-    binarys = mlb.transform(muiltilabel)
+    binarys = mlb.fit_transform(muiltilabel).tolist()
     class_labels = list(mlb.classes_)
     results = []
     for _id, text, binary in zip(unique_ids, muiltilabel, binarys):
         results.append({
             "input": _id,
             "output": text,
-            "binary": list(binary),
+            "binary": binary,
             "labels": class_labels,
         })
     return results
@@ -74,16 +76,17 @@ def main():
     cls_eval_dataset = {}
     gen_eval_dataset = {}
     for fx_type in ['eq', 'reverb']:
-        df = pd.DataFrame(dataset[fx_type])
+        df = dataset[fx_type].to_pandas()
         df_filtered = tag_merge(df, fx_type)
-        vocab = Counter(df_filtered['tags']).most_common()
-        df_tags = pd.DataFrame(vocab, columns=['tag', 'freq'])
+        df_tags = df_filtered['tags'].value_counts().rename_axis('tag').reset_index(name='freq')
         if fx_type == "eq":
             target_tags = df_tags[df_tags['freq'] > EQ_TRESHOLD]['tag']
         else:
             target_tags = df_tags[df_tags['freq'] > REVERB_TRESHOLD]['tag']
-        df_tag2ids = df_filtered.groupby("tags")["id"].agg(list)
-        tag2ids_dict = df_tag2ids[target_tags].to_dict()
+        tag2ids = defaultdict(list)
+        for tag, _id in zip(df_filtered["tags"].values, df_filtered["id"].values):
+            tag2ids[tag].append(_id)
+        tag2ids_dict = {tag: tag2ids[tag] for tag in target_tags}
         gen_eval = eval_for_generation(tag2ids_dict)
         cls_eval = eval_for_classification(tag2ids_dict)
         gen_eval_dataset[fx_type] = Dataset.from_list(gen_eval)
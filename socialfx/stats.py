@@ -1,24 +1,30 @@
+import argparse
 import os
 import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import seaborn as sns
-import ast
+from functools import lru_cache
 from datasets import load_dataset
 from sklearn.preprocessing import MultiLabelBinarizer
 from data.vocab.eq_merged import EQ_MAPPING
-from data.vocab.reverb_merge import REVERB_MAPPING
+from data.vocab.reverb_merged import REVERB_MAPPING
+from socialfx_eval import parse_lang
 
 
-def get_raw_check_stats(df, fx_type):
-    df = df.copy()
-    df['text'] = df["text"].apply(lambda x: [i.strip() for i in x.lower().split(",")])
-    mlb = MultiLabelBinarizer()
-    binary = mlb.fit_transform(df["text"])
-    df_binary = pd.DataFrame(binary, columns=mlb.classes_)
-    tag_per_param = df_binary.sum(axis=0).mean()
-    parmas_per_tag = df_binary.sum(axis=1).mean()
-    num_of_parmas = len(df["id"].unique())
+@lru_cache(maxsize=None)
+def load_hub_dataset(name):
+    """Load every split of a hub dataset once per process"""
+    return load_dataset(name)
+
+def get_raw_check_stats(ids, tokens, fx_type):
+    mlb = MultiLabelBinarizer(sparse_output=True)
+    binary = mlb.fit_transform(tokens)
+    tag_per_param = np.asarray(binary.sum(axis=0)).ravel().mean()
+    parmas_per_tag = np.asarray(binary.sum(axis=1)).ravel().mean()
+    num_of_parmas = len(ids.unique())
     num_of_words = len(mlb.classes_)
     return {
         "fx_type": fx_type,
@@ -29,37 +35,18 @@ def get_raw_check_stats(df, fx_type):
         "parmas_per_tag": parmas_per_tag
     }
 
-def get_tag_merge_stats(df, fx_type):
-    df = df.copy()
+def get_tag_merge_stats(ids, tokens, langs, fx_type):
     """Filter dataset to get English tags and their IDs"""
-    filtered = []
-    for idx, row in df.iterrows():
-        tags = row["text"].lower().split(",")
-        try:
-            extra = ast.literal_eval(row["extra"])
-            lang = extra["lang"].lower()
-        except:
-            lang = "english"
-        text = []
-        for tag in tags:
-            if fx_type == "eq":
-                tag = EQ_MAPPING.get(tag, tag)
-            elif fx_type == "reverb":
-                tag = REVERB_MAPPING.get(tag, tag)
-            text.append(tag)
-        filtered.append({
-            "id": row["id"],
-            "tags": text,
-            "lang": lang
-        })
-    df_filtered = pd.DataFrame(filtered)
-    df_filtered = df_filtered[df_filtered["lang"] == "english"]
-    mlb = MultiLabelBinarizer()
-    binary = mlb.fit_transform(df["text"])
-    df_binary = pd.DataFrame(binary, columns=mlb.classes_)
-    tag_per_param = df_binary.sum(axis=0).mean()
-    parmas_per_tag = df_binary.sum(axis=1).mean()
-    num_of_parmas = len(df["id"].unique())
+    if fx_type == "eq":
+        tokens = tokens.map(lambda tags: [EQ_MAPPING.get(tag, tag) for tag in tags])
+    elif fx_type == "reverb":
+        tokens = tokens.map(lambda tags: [REVERB_MAPPING.get(tag, tag) for tag in tags])
+    is_english = langs == "english"
+    mlb = MultiLabelBinarizer(sparse_output=True)
+    binary = mlb.fit_transform(tokens[is_english])
+    tag_per_param = np.asarray(binary.sum(axis=0)).ravel().mean()
+    parmas_per_tag = np.asarray(binary.sum(axis=1)).ravel().mean()
+    num_of_parmas = len(ids[is_english].unique())
     num_of_words = len(mlb.classes_)
     return {
         "fx_type": fx_type,
@@ -70,31 +57,16 @@ def get_tag_merge_stats(df, fx_type):
         "parmas_per_tag": parmas_per_tag
     }
 
-def get_eval_stats(fx_type):
-    cls_db = load_dataset("seungheondoh/socialfx-cls-eval", split=fx_type)
-    gen_db = load_dataset("seungheondoh/socialfx-gen-eval", split=fx_type)
-    num_of_parmas = len(set(cls_db['input']))
-    num_of_words = len(set(gen_db['input']))
-
-    mlb = MultiLabelBinarizer()
-    binary = mlb.fit_transform(cls_db["output"])
-    df_binary = pd.DataFrame(binary, columns=mlb.classes_)
-    # Calculate co-occurrence matrix
-    tag_frequencies = df_binary.sum(axis=0)
-    co_occurrence = np.dot(df_binary.T, df_binary)
-    np.fill_diagonal(co_occurrence, 0)  # Remove self-connections
-    # Normalize co-occurrence by tag frequencies
-    # Plot co-occurrence matrix
+def plot_co_occurrence(co_occurrence, labels, fx_type):
     plt.figure(figsize=(10, 8))
-    sns.heatmap(co_occurrence, cmap='viridis', xticklabels=mlb.classes_, yticklabels=mlb.classes_)
+    sns.heatmap(co_occurrence, cmap='viridis', xticklabels=labels, yticklabels=labels)
     plt.title(f'Tag Co-occurrence Matrix for {fx_type}')
     plt.tight_layout()
     os.makedirs("./data/stats", exist_ok=True)
     plt.savefig(f"./data/stats/{fx_type}_co_occurrence.png")
     plt.close()
 
-    # Plot tag distribution
-    tag_counts = df_binary.sum(axis=0).sort_values(ascending=False) / len(df_binary)
+def plot_tag_distribution(tag_counts, fx_type):
     plt.figure(figsize=(12, 6))
     tag_counts.plot(kind='bar')
     plt.title(f'Tag Distribution for {fx_type}')
@@ -102,10 +74,30 @@ def get_eval_stats(fx_type):
     plt.ylabel('Frequency')
     plt.xticks(rotation=90)
     plt.tight_layout()
+    os.makedirs("./data/stats", exist_ok=True)
     plt.savefig(f"./data/stats/{fx_type}_tag_distribution.png")
     plt.close()
-    tag_per_param = df_binary.sum(axis=0).mean()
-    parmas_per_tag = df_binary.sum(axis=1).mean()
+
+def get_eval_stats(fx_type, plot=False):
+    cls_db = load_hub_dataset("seungheondoh/socialfx-cls-eval")[fx_type]
+    gen_db = load_hub_dataset("seungheondoh/socialfx-gen-eval")[fx_type]
+    num_of_parmas = len(set(cls_db['input']))
+    num_of_words = len(set(gen_db['input']))
+
+    mlb = MultiLabelBinarizer(sparse_output=True)
+    binary = mlb.fit_transform(cls_db["output"])
+    tag_frequencies = np.asarray(binary.sum(axis=0), dtype=np.float64).ravel()
+    if plot:
+        # Calculate co-occurrence matrix
+        co_occurrence = (binary.T @ binary).toarray()
+        np.fill_diagonal(co_occurrence, 0)  # Remove self-connections
+        # Normalize co-occurrence by tag frequencies
+        normalized_co_occurrence = co_occurrence / np.maximum(tag_frequencies[:, None], 1)
+        plot_co_occurrence(normalized_co_occurrence, mlb.classes_, fx_type)
+        tag_counts = pd.Series(tag_frequencies, index=mlb.classes_).sort_values(ascending=False) / binary.shape[0]
+        plot_tag_distribution(tag_counts, fx_type)
+    tag_per_param = tag_frequencies.mean()
+    parmas_per_tag = np.asarray(binary.sum(axis=1)).ravel().mean()
     return {
         "fx_type": fx_type,
         "split": "eval",
@@ -115,15 +107,22 @@ def get_eval_stats(fx_type):
         "parmas_per_tag": parmas_per_tag
     }
 
-def main():
-    dataset = load_dataset("seungheondoh/socialfx-original")
+def main(plot=False):
+    dataset = load_hub_dataset("seungheondoh/socialfx-original")
     results = []
     for fx_type in ['eq', 'reverb']:
-        df = pd.DataFrame(dataset[fx_type])
-        raw_stats = get_raw_check_stats(df, fx_type)
-        eval_stats = get_eval_stats(fx_type)
+        df = dataset[fx_type].to_pandas()
+        # tokenize and parse once, shared by the raw and tag_merge stats
+        ids = df["id"]
+        tokens = df["text"].str.lower().str.split(",").map(lambda tags: [tag.strip() for tag in tags])
+        langs = df["extra"].map(parse_lang)
+        raw_stats = get_raw_check_stats(ids, tokens, fx_type)
+        merge_stats = get_tag_merge_stats(ids, tokens, langs, fx_type)
+        eval_stats = get_eval_stats(fx_type, plot=plot)
         os.makedirs("./data/stats", exist_ok=True)
-        pd.DataFrame([raw_stats, eval_stats]).to_csv(f"./data/stats/{fx_type}.csv", index=False)
+        pd.DataFrame([raw_stats, merge_stats, eval_stats]).to_csv(f"./data/stats/{fx_type}.csv", index=False)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plot", action="store_true", help="also save co-occurrence and tag distribution plots")
+    main(plot=parser.parse_args().plot)